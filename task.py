@@ -1,8 +1,32 @@
 import pickle
-from collections import defaultdict, UserDict
-from datetime import datetime, timedelta
+import re
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import count
 from pathlib import Path
 
+try:
+    from orjson import dumps as _dumps, loads as _loads
+except ImportError:
+    import json
+
+    def _dumps(obj):
+        return json.dumps(obj).encode()
+
+    _loads = json.loads
+
+
+_PHONE_STRIP = re.compile(r"[^\d+\-()]", re.ASCII).sub
+_PHONE_NON_DIGIT = re.compile(r"\D", re.ASCII).sub
+_WEEKEND_SHIFT = (0, 0, 0, 0, 0, 2, 1)
+
+
+@lru_cache(maxsize=1024)
+def _parse_birthday(value):
+    return datetime.strptime(value, "%d.%m.%Y").date()
+
 
 class Field:
     def __init__(self, value):
@@ -18,17 +42,22 @@ class Name(Field):
 
 class Phone(Field):
     def __init__(self, value):
-        super().__init__(value)
-        sanitized_value = ''.join(char for char in value if char.isdigit() or char in {'+', '-', '(', ')'})
-        if len(sanitized_value) != 10:
+        sanitized_value = _PHONE_STRIP("", value)
+        if len(_PHONE_NON_DIGIT("", sanitized_value)) != 10:
             raise ValueError("Phone number must contain 10 digits.")
-        self.value = sanitized_value
+        super().__init__(sanitized_value)
+
+    @classmethod
+    def from_stored(cls, value):
+        phone = cls.__new__(cls)
+        Field.__init__(phone, value)
+        return phone
 
 
 class Birthday(Field):
     def __init__(self, value):
         try:
-            self.date = datetime.strptime(value, "%d.%m.%Y").date()
+            self.date = _parse_birthday(value)
             super().__init__(value)
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
@@ -39,109 +68,168 @@ class Record:
         self.name = Name(name)
         self.phones = []
         self.birthday = None
+        self._phone_index = defaultdict(list)
+        self._next_bday_cache = None
+        self._str_cache = None
+        self._book = None
 
     def add_phone(self, phone):
         try:
             phone = Phone(phone)
-            self.phones.append(phone)
         except ValueError as e:
             raise ValueError(f"Error adding phone: {e}")
+        self._append_phone(phone)
+
+    def _append_phone(self, phone):
+        self.phones.append(phone)
+        self._phone_index[phone.value].append(phone)
+        self._str_cache = None
+
+    def _take_phone(self, phone):
+        matches = self._phone_index.get(phone)
+        if not matches:
+            raise ValueError("Phone number not found in record.")
+        p = matches.pop(0)
+        if not matches:
+            del self._phone_index[phone]
+        return p
 
     def remove_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
-                return
-        raise ValueError("Phone number not found in record.")
+        p = self._take_phone(phone)
+        self.phones.remove(p)
+        self._str_cache = None
 
     def edit_phone(self, old_phone, new_phone):
-        for p in self.phones:
-            if p.value == old_phone:
-                try:
-                    new_phone = Phone(new_phone)
-                except ValueError as e:
-                    raise ValueError(f"Error: {e}")
-                p.value = new_phone.value
-                return
-        raise ValueError("Phone number not found in record.")
+        if not self._phone_index.get(old_phone):
+            raise ValueError("Phone number not found in record.")
+        try:
+            new_phone = Phone(new_phone)
+        except ValueError as e:
+            raise ValueError(f"Error: {e}")
+        p = self._take_phone(old_phone)
+        p.value = new_phone.value
+        self._phone_index[p.value].append(p)
+        self._str_cache = None
 
     def find_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        matches = self._phone_index.get(phone)
+        return matches[0] if matches else None
 
-    def get_upcoming_birthdays(self):
-        upcoming_birthdays = []
-        today = datetime.today().date()
+    def _next_birthday(self, today):
+        cache = self._next_bday_cache
+        if cache is not None and cache[0] == today:
+            return cache[1]
 
-        if self.birthday:
-            birthday = self.birthday.date
+        birthday = self.birthday.date
 
-            next_birthday = birthday.replace(year=today.year)
-            if next_birthday < today:
-                next_birthday = next_birthday.replace(year=today.year + 1)
+        next_birthday = birthday.replace(year=today.year)
+        if next_birthday < today:
+            next_birthday = next_birthday.replace(year=today.year + 1)
 
-            while next_birthday.weekday() >= 5:
-                next_birthday += timedelta(days=1)
+        shift = _WEEKEND_SHIFT[next_birthday.weekday()]
+        if shift:
+            next_birthday += timedelta(days=shift)
+
+        self._next_bday_cache = (today, next_birthday)
+        return next_birthday
+
+    def append_upcoming_birthday(self, today, out):
+        if self.birthday:
+            next_birthday = self._next_birthday(today)
 
             days_until_birthday = (next_birthday - today).days
             if 0 <= days_until_birthday <= 7:
-                upcoming_birthdays.append({
-                    "name": self.name.value,
-                    "congratulation_date": next_birthday.strftime("%d.%m.%Y")
-                })
-
-        return upcoming_birthdays
+                out.append(f"{self.name.value} - {next_birthday:%d.%m.%Y}")
 
     def add_birthday(self, birthday):
         try:
             self.birthday = Birthday(birthday)
+            self._next_bday_cache = None
+            self._str_cache = None
         except ValueError as e:
             raise ValueError(f"Error adding birthday: {e}")
+        if self._book is not None:
+            self._book._birthday_added(self)
 
     def __str__(self):
-        phones_str = ', '.join(str(phone.value) for phone in self.phones)
-        return f"Contact name: {self.name.value}, phones: {phones_str}, birthday: {self.birthday.value if self.birthday else None}"
+        if self._str_cache is None:
+            phones_str = ', '.join(str(phone.value) for phone in self.phones)
+            self._str_cache = f"Contact name: {self.name.value}, phones: {phones_str}, birthday: {self.birthday.value if self.birthday else None}"
+        return self._str_cache
+
 
+class AddressBook(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._bday_records = {}
+        self._positions = {}
+        self._next_position = count()
+        for record in dict(*args, **kwargs).values():
+            self.add_record(record)
 
-class AddressBook(UserDict):
     def add_record(self, record):
-        self.data[record.name.value] = record
+        name = record.name.value
+        if name not in self:
+            self._positions[name] = next(self._next_position)
+        self[name] = record
+        record._book = self
+        if record.birthday:
+            self._bday_records[name] = record
+        else:
+            self._bday_records.pop(name, None)
 
     def delete_record(self, name):
-        if name in self.data:
-            del self.data[name]
+        self._bday_records.pop(name, None)
+        self._positions.pop(name, None)
+        if self.pop(name, None) is not None:
             print("Record removed successfully.")
         else:
             print("Record not found.")
 
     def find_record(self, name):
-        return self.data.get(name)
+        return self.get(name)
+
+    def set_birthday(self, name, birthday):
+        self[name].add_birthday(birthday)
+
+    def _birthday_added(self, record):
+        self._bday_records[record.name.value] = record
+
+    def records_with_birthday(self):
+        records = [r for name, r in self._bday_records.items() if self.get(name) is r]
+        records.sort(key=lambda r: self._positions[r.name.value])
+        return records
+
+    def to_dict(self):
+        return {
+            name: {
+                "phones": [p.value for p in record.phones],
+                "birthday": record.birthday.value if record.birthday else None,
+            }
+            for name, record in self.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        book = cls()
+        for name, fields in data.items():
+            record = Record(name)
+            for phone in fields["phones"]:
+                record._append_phone(Phone.from_stored(phone))
+            if fields["birthday"]:
+                record.add_birthday(fields["birthday"])
+            book.add_record(record)
+        return book
 
     def show_all_records(self):
-        if self.data:
+        if self:
             print("All records in the address book:")
-            for name, record in self.data.items():
+            for name, record in self.items():
                 print(f"{name}: {record}")
         else:
             print("Address book is empty.")
 
 
-def input_error(func):
-    def wrapper(*args, **kwargs):
-        try:
-            return func(*args, **kwargs)
-        except KeyError:
-            return "KeyError"
-        except ValueError as e:
-            return f"ValueError: {e}"
-        except IndexError:
-            return "IndexError"
-    return wrapper
-
-
-@input_error
 def add_birthday(args, book):
     if len(args) < 2:
         return "Not enough arguments. Please provide both name and birthday (DD.MM.YYYY)."
@@ -153,7 +241,7 @@ def add_birthday(args, book):
             return f"Birthday already exists for {name}."
         else:
             try:
-                record.add_birthday(birthday)
+                book.set_birthday(name, birthday)
                 return f"Birthday added successfully for {name}."
             except ValueError as e:
                 return f"Error adding birthday: {e}"
@@ -161,7 +249,6 @@ def add_birthday(args, book):
         return "Record not found."
 
 
-@input_error
 def show_birthday(args, book):
     name = args[0]
     record = book.find_record(name)
@@ -173,16 +260,11 @@ def show_birthday(args, book):
         return "Record not found."
 
 
-@input_error
 def birthdays(args, book):  
-    upcoming_birthdays = []
-    for record in book.data.values():
-        if record.birthday:
-            upcoming_birthdays.extend(record.get_upcoming_birthdays())
-
+    today = date.today()
     upcoming_birthday_names = []
-    for user in upcoming_birthdays:
-        upcoming_birthday_names.append(user["name"] + " - " + user["congratulation_date"])
+    for record in book.records_with_birthday():
+        record.append_upcoming_birthday(today, upcoming_birthday_names)
 
     if upcoming_birthday_names:
         return "Upcoming birthdays:\n" + "\n".join(upcoming_birthday_names)
@@ -190,7 +272,6 @@ def birthdays(args, book):
         return "No upcoming birthdays in the next 7 days."
 
 
-@input_error
 def add_contact(args, book: AddressBook):
     if len(args) < 2:
         return "Not enough arguments. Please provide both name and phone number."
@@ -206,7 +287,6 @@ def add_contact(args, book: AddressBook):
     return message
 
 
-@input_error
 def change_contact(args, book: AddressBook):
     if len(args) < 2:
         return "Not enough arguments. Please provide both name and new phone number."
@@ -222,7 +302,6 @@ def change_contact(args, book: AddressBook):
         return "Record not found."
 
 
-@input_error
 def show_phones(args, book: AddressBook):
     if len(args) < 1:
         return "Not enough arguments. Please provide a name."
@@ -235,72 +314,117 @@ def show_phones(args, book: AddressBook):
         return f"Record for {name} not found."
 
 
-@input_error
-def show_all(book: AddressBook):
-    if book.data:
-        return "\n".join(f"{name}: {record}" for name, record in book.data.items())
+def show_all(book: AddressBook, file=None):
+    write = (file or sys.stdout).write
+    if book:
+        for name, record in book.items():
+            write(name)
+            write(": ")
+            write(str(record))
+            write("\n")
     else:
-        return "Address book is empty."
+        write("Address book is empty.\n")
 
 
-def save_data(book, filename="addressbook.pkl"):
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+def save_data(book, filename="addressbook.json"):
+    Path(filename).write_bytes(_dumps(book.to_dict()))
+
+
+class _LegacyAddressBook(dict):
+    pass
 
 
-def load_data(filename="addressbook.pkl"):
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if name == "AddressBook":
+            return _LegacyAddressBook
+        if module == "__main__":
+            module = __name__
+        return super().find_class(module, name)
+
+
+def _load_legacy_pickle(path):
+    with open(path, "rb") as f:
+        legacy = _LegacyUnpickler(f).load()
+    records = vars(legacy).get("data", legacy)
+    return AddressBook.from_dict(AddressBook(records).to_dict())
+
+
+def load_data(filename="addressbook.json"):
+  path = Path(filename)
   try:
-    with open(filename, "rb") as f:
-      return pickle.load(f)
+    return AddressBook.from_dict(_loads(path.read_bytes()))
   except FileNotFoundError:
+    legacy_path = path.with_suffix(".pkl")
+    if legacy_path.exists():
+      book = _load_legacy_pickle(legacy_path)
+      save_data(book, filename)
+      return book
     print("Файл address book не знайдено. Створюється новий.")
     return AddressBook() 
 
 
 
 def parse_input(user_input):
+    user_input = user_input.strip()
     if user_input:
-        return user_input.split()
+        return user_input.split(None, 3)
     else:
         return [] 
 
 
 
+_COMMANDS = {
+    "add": add_contact,
+    "change": change_contact,
+    "phone": show_phones,
+    "add_birthday": add_birthday,
+    "show_birthday": show_birthday,
+    "birthdays": birthdays,
+}
+_EXIT = {"close", "exit"}
+_NO_BOOK = {"hello", *_EXIT}
+
+
 def main():
-    book = load_data()
+    book = None
+    interactive = sys.stdin.isatty()
     print("Welcome to the assistant bot!")
     while True:
-        user_input = input("Enter a command: ")
-        command, *args = parse_input(user_input)
+        if interactive:
+            user_input = input("Enter a command: ")
+        else:
+            line = sys.stdin.readline()
+            user_input = line.rstrip("\n") if line else "exit"
+        parts = parse_input(user_input)
+        if not parts:
+            continue
+        command, *args = parts
+
+        if book is None and command not in _NO_BOOK:
+            book = load_data()
+
+        handler = _COMMANDS.get(command)
+        if handler:
+            try:
+                result = handler(args, book)
+            except (KeyError, IndexError) as e:
+                result = type(e).__name__
+            except ValueError as e:
+                result = f"ValueError: {e}"
+            print(result)
 
-        if command in ["close", "exit"]:
-            save_data(book) 
+        elif command in _EXIT:
+            if book is not None:
+                save_data(book)
             print("Good bye!")
             break
 
         elif command == "hello":
             print("How can I help you?")
 
-        elif command == "add":
-            print(add_contact(args, book))
-
-        elif command == "change":
-            print(change_contact(args, book))
-
-        elif command == "phone":
-            print(show_phones(args, book))
-
         elif command == "all":
-            print(show_all(book))
-
-        elif command == "add_birthday":
-            print(add_birthday(args, book))
-
-        elif command == "show_birthday":
-            print(show_birthday(args, book))
-
-        elif command == "birthdays":
-            print(birthdays(args, book))
+            show_all(book)
 
         else:
             print("Invalid command.")